@@ -6,12 +6,24 @@ import imaplib
 import email
 from email.header import decode_header
 from email.utils import parsedate_to_datetime
-import io
 import os
+import glob
+import shutil
+import threading
+import time
+import uuid
 import numpy as np
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 import calendar
 from zoneinfo import ZoneInfo
+from stock_parsing import clean_sku, parse_stock_file_in_subprocess
+
+# Copy-on-Write: הטבלאות הטעונות משותפות בין כל הסשנים ונחשבות לקריאה בלבד,
+# כל שינוי בטבלה נגזרת יוצר עותק רק של מה שהשתנה - ולכן אין צורך ב-.copy() הגנתי
+# (מ-pandas 3 זו ברירת המחדל והאופציה הוצאה משימוש)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 # ==========================================
 # 1. הגדרות עמוד
@@ -40,6 +52,47 @@ COL_TYPE = 'סוג הזמנה'
 
 INVENTORY_CACHE_FILE = "inventory_cache.csv"
 INVENTORY_DATE_FILE = "inventory_date.txt"
+INVENTORY_PREV_CACHE_FILE = "inventory_prev_cache.csv"
+
+COL_STOCK = 'מלאי_נוכחי'
+# עמודת מלאי לכל מקור בטבלה המאוחדת: מלאי_<שם המקור>
+SOURCE_STOCK_PREFIX = 'מלאי_'
+# עמודות הקלט של חישובי המלאי לכל מק"ט
+INVENTORY_INPUT_COLS = [COL_STOCK, 'sales_90', 'sales_30']
+# חלונות המכירות נשמרים עם כל סנאפשוט, כדי שהפיד ישווה גם מכירות ולא רק מלאי
+SNAPSHOT_SALES_COLS = ['sales_90', 'sales_30']
+
+# מקורות מלאי - מוגדרים ב-secrets.toml, למשל:
+#   [[inventory_sources]]
+#   name = "גלובוס"
+#   type = "email"            # מצורף במייל (user/password מ-[email])
+#   sender = "GlobusInfo@globus-intr.co.il"
+#   subject = "מלאי סלים פרייס"
+#   filename = "stock122.xlsx"
+#
+#   [[inventory_sources]]
+#   name = "מחסן דרום"
+#   type = "folder"           # הקובץ האחרון בתיקייה
+#   path = "drops/south"
+#   pattern = "*.xlsx"
+#   sku_column = "פריט"       # אופציונלי, ברירת מחדל כמו בגלובוס
+#   qty_column = "כמות זמינה"
+# בלי הגדרה - משתמשים במקור הגלובוס בלבד.
+DEFAULT_INVENTORY_SOURCE = {
+    "name": "גלובוס",
+    "type": "email",
+    "sender": "GlobusInfo@globus-intr.co.il",
+    "subject": "מלאי סלים פרייס",
+    "filename": "stock122.xlsx",
+}
+STOCK_SKU_COLUMN = "פריט"
+STOCK_QTY_COLUMN = "כמות זמינה"
+
+# כל התאריכים של קבצי המלאי מנורמלים לשעון ישראל (מיילים מגיעים עם אזורי זמן שונים)
+LOCAL_TZ = ZoneInfo("Asia/Jerusalem")
+
+# סשן שלא רץ מעל זמן זה לא נספר בדוח הזיכרון
+SESSION_IDLE_SECONDS = 30 * 60
 
 # ==========================================
 # 🎨 CSS
@@ -105,18 +158,12 @@ def normalize_phone_str(phone_val):
         clean = '0' + clean
     return clean
 
-def clean_sku(val):
-    if pd.isna(val): return ""
-    val = str(val).upper()
-    val = val.replace('/', ' ').replace('\\', ' ')
-    val = re.sub(r'\s+', ' ', val).strip()
-    return val
-
 # ==========================================
 # 📥 טעינת נתונים (SQL View + Email + Cache)
 # ==========================================
 
-@st.cache_data
+# cache_resource (ולא cache_data) - אותם אובייקטים משותפים לכל הסשנים בלי עותק לכל ריצה
+@st.cache_resource
 def load_data_from_sql():
     try:
         conn = psycopg2.connect(
@@ -175,13 +222,13 @@ def load_data_from_sql():
         
         # א. חלקי חילוף
         mask_parts = df_all_raw[COL_TYPE] == 'Spare Part'
-        df_parts_raw = df_all_raw[mask_parts].copy()
+        df_parts_raw = df_all_raw[mask_parts]
         # ספירה לפי מק"ט (כמה פעמים יצא חלק)
         df_parts_agg = df_parts_raw.groupby(COL_SKU).size().reset_index(name='spare_count')
 
         # ב. איסופים
         mask_pickups = df_all_raw[COL_TYPE] == 'Pickup'
-        df_pickups_raw = df_all_raw[mask_pickups].copy()
+        df_pickups_raw = df_all_raw[mask_pickups]
         # ספירה לפי מק"ט (כמה פעמים בוצע איסוף)
         df_pickups_agg = df_pickups_raw.groupby(COL_SKU).size().reset_index(name='pickup_count')
 
@@ -189,19 +236,19 @@ def load_data_from_sql():
         # -----------------------------------------------------------------
         # אנחנו משאירים רק מה שהוא "Regular Order" או "Pre-Order" (או פשוט כל מה שלא מיוחד)
         mask_sales = ~df_all_raw[COL_TYPE].isin(['Spare Part', 'Pickup'])
-        df_sales = df_all_raw[mask_sales].copy()
+        df_sales = df_all_raw[mask_sales]
 
         # 3. המשך עיבוד רגיל על טבלת המכירות בלבד (df_sales)
         # -----------------------------------------------------------------
         
         # הזמנות רגילות - חייבות תאריך
         mask_regular = df_sales[COL_TYPE].astype(str).str.contains("Regular", case=False, na=False)
-        df_regular = df_sales[mask_regular].copy()
+        df_regular = df_sales[mask_regular]
         df_regular = df_regular.dropna(subset=[COL_DATE])
         
         # הזמנות מוקדמות (Pre-Order) - לחישוב Backlog
         mask_pre = df_sales[COL_TYPE].astype(str).str.contains("Pre", case=False, na=False)
-        df_pre = df_sales[mask_pre].copy()
+        df_pre = df_sales[mask_pre]
         
         if not df_pre.empty:
             df_pre_grouped = df_pre.groupby(COL_SKU)[COL_QUANTITY].sum().reset_index().rename(columns={COL_QUANTITY: 'backlog_qty'})
@@ -220,16 +267,18 @@ def load_data_from_sql():
         st.error(f"שגיאה בחיבור למסד הנתונים: {e}")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-def load_inventory_cache():
-    df_inv = None
-    if os.path.exists(INVENTORY_CACHE_FILE):
-        try:
-            df_inv = pd.read_csv(INVENTORY_CACHE_FILE)
-            if COL_SKU in df_inv.columns:
-                df_inv[COL_SKU] = df_inv[COL_SKU].apply(clean_sku)
-        except Exception:
-            df_inv = None
-            
+def read_inventory_csv(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        df_inv = pd.read_csv(path)
+        if COL_SKU in df_inv.columns:
+            df_inv[COL_SKU] = df_inv[COL_SKU].apply(clean_sku)
+        return df_inv
+    except Exception:
+        return None
+
+def read_inventory_date():
     inv_date = None
     if os.path.exists(INVENTORY_DATE_FILE):
         try:
@@ -237,112 +286,439 @@ def load_inventory_cache():
                 inv_date = f.read().strip()
         except:
             inv_date = None
-            
-    return df_inv, inv_date
-
-def fetch_inventory_from_email():
-    if "email" not in st.secrets:
-        st.error("חסרים פרטי אימייל ב-secrets.toml")
-        return None, None
-
-    EMAIL_USER = st.secrets["email"]["user"]
-    EMAIL_PASS = st.secrets["email"]["password"]
-    TARGET_SENDER = st.secrets["email"].get("sender_email", "GlobusInfo@globus-intr.co.il")
-    TARGET_SUBJECT = "מלאי סלים פרייס"
-    FILE_TO_FIND = "stock122.xlsx"
-
-    status_container = st.empty()
-    status_container.info("🔄 מושך מלאי...")
+    return inv_date
 
+def load_inventory_cache():
+    return read_inventory_csv(INVENTORY_CACHE_FILE), read_inventory_date()
+
+def load_previous_inventory_cache():
+    return read_inventory_csv(INVENTORY_PREV_CACHE_FILE)
+
+def inventory_snapshot_key():
+    # זמני השינוי של קבצי המלאי - גם קובץ שנכתב מתהליך או שרת אחר מרענן את המטמון
+    return tuple(
+        os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        for path in (INVENTORY_CACHE_FILE, INVENTORY_PREV_CACHE_FILE, INVENTORY_DATE_FILE)
+    )
+
+@st.cache_resource(max_entries=2)
+def load_inventory_snapshot(snapshot_key):
+    # סנאפשוט מלאי משותף לכל הסשנים (קריאה בלבד), לפי snapshot_key
+    df_inv, inv_date = load_inventory_cache()
+    return df_inv, inv_date, load_previous_inventory_cache()
+
+def decode_mime_header(value):
+    text, encoding = decode_header(value)[0]
+    if isinstance(text, bytes):
+        text = text.decode(encoding if encoding else "utf-8")
+    return text
+
+def to_local_time(dt):
+    # תאריך מייל בלי אזור זמן (-0000) הוא UTC לפי RFC 2822
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(LOCAL_TZ)
+
+def get_inventory_sources():
+    if "inventory_sources" in st.secrets:
+        return [dict(source) for source in st.secrets["inventory_sources"]]
+
+    # ברירת מחדל - המקור היחיד שהיה עד היום
+    default_source = dict(DEFAULT_INVENTORY_SOURCE)
+    if "email" in st.secrets:
+        default_source["sender"] = st.secrets["email"].get("sender_email", default_source["sender"])
+    return [default_source]
+
+def validate_inventory_sources(sources):
+    # שם המקור הופך לשם עמודה (מלאי_<שם>) - חייב להיות קיים, ייחודי ולא להתנגש בסה"כ
+    if not sources:
+        return ["לא הוגדר אף מקור (inventory_sources ריק)"]
+    problems, seen = [], set()
+    for i, source in enumerate(sources, start=1):
+        name = str(source.get("name", "")).strip()
+        label = f"מקור {i}" + (f" ({name})" if name else "")
+        if not name:
+            problems.append(f"{label}: חסר name")
+        elif name in seen:
+            problems.append(f"{label}: השם כבר מוגדר במקור אחר")
+        elif SOURCE_STOCK_PREFIX + name == COL_STOCK:
+            problems.append(f"{label}: השם שמור לעמודת הסה\"כ")
+        seen.add(name)
+
+        source_type = source.get("type", "email")
+        required = {"email": ["sender", "subject", "filename"], "folder": ["path"]}.get(source_type)
+        if required is None:
+            problems.append(f"{label}: type לא מוכר '{source_type}' (email או folder)")
+            continue
+        missing = [key for key in required if not source.get(key)]
+        if missing:
+            problems.append(f"{label}: חסרים {', '.join(missing)}")
+    return problems
+
+# --- פונקציות שרצות ב-threads: בלי קריאות st.*, שגיאה נזרקת כ-Exception ---
+
+def fetch_email_attachment(source, email_user, email_pass):
+    mail = imaplib.IMAP4_SSL(source.get("imap_server", "imap.gmail.com"))
     try:
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(EMAIL_USER, EMAIL_PASS)
+        mail.login(email_user, email_pass)
         mail.select("inbox")
 
-        status, messages = mail.search(None, f'FROM "{TARGET_SENDER}"')
+        _, messages = mail.search(None, f'FROM "{source["sender"]}"')
         if not messages[0]:
-            status_container.warning(f"לא נמצאו מיילים מ-{TARGET_SENDER}")
-            return None, None
+            raise ValueError(f"לא נמצאו מיילים מ-{source['sender']}")
 
-        email_ids = messages[0].split()
-        
-        for eid in reversed(email_ids[-10:]):
+        for eid in reversed(messages[0].split()[-10:]):
             _, msg_data = mail.fetch(eid, "(RFC822)")
             for response_part in msg_data:
-                if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    subject, encoding = decode_header(msg["Subject"])[0]
-                    if isinstance(subject, bytes):
-                        subject = subject.decode(encoding if encoding else "utf-8")
-                    
-                    if TARGET_SUBJECT in subject:
-                        for part in msg.walk():
-                            if part.get_content_maintype() == "multipart": continue
-                            if part.get("Content-Disposition") is None: continue
-                            
-                            filename = part.get_filename()
-                            if filename:
-                                filename, encoding = decode_header(filename)[0]
-                                if isinstance(filename, bytes):
-                                    filename = filename.decode(encoding if encoding else "utf-8")
-                                
-                                if FILE_TO_FIND in filename:
-                                    file_data = part.get_payload(decode=True)
-                                    
-                                    email_date_str = msg["Date"]
-                                    try:
-                                        dt_obj = parsedate_to_datetime(email_date_str)
-                                        formatted_date = dt_obj.strftime("%d/%m/%y")
-                                    except:
-                                        formatted_date = datetime.now().strftime("%d/%m/%y")
-                                        
-                                    status_container.success(f"✅ מלאי עודכן בהצלחה (תאריך: {formatted_date})")
-                                    
-                                    mail.close()
-                                    mail.logout()
-                                    
-                                    try:
-                                        excel_file = io.BytesIO(file_data)
-                                        df_temp = pd.read_excel(excel_file, header=None)
-                                        header_row = -1
-                                        for i, row in df_temp.iterrows():
-                                            if "פריט" in row.astype(str).values:
-                                                header_row = i
-                                                break
-                                        
-                                        if header_row == -1: return None, None
-                                        
-                                        excel_file.seek(0)
-                                        df_inv = pd.read_excel(excel_file, header=header_row)
-                                        
-                                        df_inv["כמות זמינה"] = pd.to_numeric(df_inv["כמות זמינה"], errors="coerce").fillna(0).astype(int)
-                                        pivot_inv = df_inv.groupby("פריט")["כמות זמינה"].sum().reset_index()
-                                        pivot_inv.columns = [COL_SKU, "מלאי_נוכחי"]
-                                        pivot_inv[COL_SKU] = pivot_inv[COL_SKU].apply(clean_sku)
-                                        
-                                        pivot_inv.to_csv(INVENTORY_CACHE_FILE, index=False)
-                                        with open(INVENTORY_DATE_FILE, "w") as f:
-                                            f.write(formatted_date)
-                                            
-                                        return pivot_inv, formatted_date
-                                        
-                                    except Exception as e:
-                                        st.error(f"שגיאה בעיבוד אקסל: {e}")
-                                        return None, None
-        
-        status_container.warning("לא נמצא קובץ אקסל מתאים במיילים האחרונים.")
-        mail.close()
-        mail.logout()
+                if not isinstance(response_part, tuple):
+                    continue
+                msg = email.message_from_bytes(response_part[1])
+                if source["subject"] not in decode_mime_header(msg["Subject"]):
+                    continue
+
+                for part in msg.walk():
+                    if part.get_content_maintype() == "multipart": continue
+                    if part.get("Content-Disposition") is None: continue
+
+                    filename = part.get_filename()
+                    if filename and source["filename"] in decode_mime_header(filename):
+                        try:
+                            file_date = to_local_time(parsedate_to_datetime(msg["Date"]))
+                        except (TypeError, ValueError):
+                            file_date = datetime.now(LOCAL_TZ)
+                        return part.get_payload(decode=True), decode_mime_header(filename), file_date
+
+        raise ValueError("לא נמצא קובץ אקסל מתאים במיילים האחרונים")
+    finally:
+        for cleanup in (mail.close, mail.logout):
+            try:
+                cleanup()
+            except Exception:
+                pass
+
+def fetch_folder_file(source):
+    pattern = os.path.join(source["path"], source.get("pattern", "*.xlsx"))
+    files = glob.glob(pattern)
+    if not files:
+        raise ValueError(f"לא נמצאו קבצים ב-{pattern}")
+
+    # הקובץ האחרון שהונח בתיקייה
+    latest = max(files, key=os.path.getmtime)
+    with open(latest, "rb") as f:
+        file_data = f.read()
+    return file_data, os.path.basename(latest), datetime.fromtimestamp(os.path.getmtime(latest), LOCAL_TZ)
+
+def load_inventory_source(source, email_user, email_pass):
+    if source.get("type", "email") == "folder":
+        file_data, filename, file_date = fetch_folder_file(source)
+    else:
+        file_data, filename, file_date = fetch_email_attachment(source, email_user, email_pass)
+
+    stock = parse_stock_file_in_subprocess(
+        file_data, filename,
+        source.get("sku_column", STOCK_SKU_COLUMN),
+        source.get("qty_column", STOCK_QTY_COLUMN)
+    )
+    return stock.rename_axis(COL_SKU).rename(COL_STOCK).reset_index(), file_date
+
+# --- איחוד המקורות ---
+
+def merge_inventory_sources(source_frames):
+    # טבלה אחת לכל מק"ט: סה"כ מלאי + עמודה לכל מקור
+    per_source = pd.concat(
+        [
+            df_source.groupby(COL_SKU)[COL_STOCK].sum().rename(SOURCE_STOCK_PREFIX + name)
+            for name, df_source in source_frames.items()
+        ],
+        axis=1
+    ).fillna(0).astype(int)
+    per_source.index.name = COL_SKU
+    per_source.insert(0, COL_STOCK, per_source.sum(axis=1))
+    return per_source.reset_index()
+
+def source_stock_columns(df_inv):
+    return [c for c in df_inv.columns if c.startswith(SOURCE_STOCK_PREFIX) and c != COL_STOCK]
+
+def inventory_changed(old_inv, new_inv):
+    old_stock = old_inv.groupby(COL_SKU)[COL_STOCK].sum()
+    new_stock = new_inv.groupby(COL_SKU)[COL_STOCK].sum()
+    return not old_stock.equals(new_stock)
+
+@st.cache_resource
+def inventory_write_lock():
+    # רוטציה + כתיבה של קבצי המלאי כפעולה אחת - שתי משיכות במקביל לא ידרסו זו את זו
+    return threading.Lock()
+
+def write_file_atomic(path, write):
+    # כותבים לקובץ זמני באותה תיקייה ומחליפים בבת אחת - קורא אף פעם לא רואה קובץ חסר או חצי כתוב
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def fetch_inventory_from_sources():
+    sources = get_inventory_sources()
+    problems = validate_inventory_sources(sources)
+    if problems:
+        st.error("הגדרת inventory_sources ב-secrets.toml שגויה:\n" + "\n".join(f"- {p}" for p in problems))
+        return None, None
+    needs_email = any(source.get("type", "email") == "email" for source in sources)
+    if needs_email and "email" not in st.secrets:
+        st.error("חסרים פרטי אימייל ב-secrets.toml")
         return None, None
 
-    except Exception as e:
-        st.error(f"שגיאה בהתחברות למייל: {e}")
+    email_user = st.secrets["email"]["user"] if needs_email else None
+    email_pass = st.secrets["email"]["password"] if needs_email else None
+
+    status_container = st.empty()
+    status_container.info(f"🔄 מושך מלאי מ-{len(sources)} מקורות...")
+
+    # כל מקור ב-thread משלו: המשיכה (IMAP/דיסק) היא בעיקר המתנה, והפענוח רץ בתהליך נפרד
+    # (ראו stock_parsing.py) - כך שגם הפענוחים של כמה מקורות חופפים בזמן
+    source_frames, source_dates, errors = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        futures = {
+            pool.submit(load_inventory_source, source, email_user, email_pass): source["name"]
+            for source in sources
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                source_frames[name], source_dates[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    cached_inv = read_inventory_csv(INVENTORY_CACHE_FILE)
+    uncovered = []
+    for name, e in errors.items():
+        # מקור שנכשל - ממשיכים עם המלאי האחרון שנשמר ממנו, כדי שלא "ייעלם" מהסה"כ
+        cached_col = SOURCE_STOCK_PREFIX + name
+        if cached_inv is not None and cached_col in cached_inv.columns:
+            source_frames[name] = cached_inv[[COL_SKU, cached_col]].rename(columns={cached_col: COL_STOCK})
+            st.warning(f"⚠️ {name}: {e} - משתמש במלאי השמור האחרון")
+        else:
+            st.error(f"❌ {name}: {e}")
+            uncovered.append(name)
+
+    # בלי מלאי שמור מהמקור הסה"כ יהיה חסר, והפיד יסמן את כל המק"טים שלו כ"ירדו לחוסר" -
+    # לא כותבים כלום ומשאירים את הסנאפשוט הקיים כמו שהוא
+    if uncovered:
+        status_container.warning(f"המלאי לא עודכן - אין נתונים (גם לא שמורים) מ: {', '.join(uncovered)}")
         return None, None
 
+    if not source_dates:
+        status_container.warning("לא נמשך מלאי חדש מאף מקור.")
+        return None, None
+
+    # סדר העמודות לפי סדר המקורות בהגדרות, לא לפי מי שסיים ראשון
+    source_frames = {source["name"]: source_frames[source["name"]] for source in sources if source["name"] in source_frames}
+    pivot_inv = merge_inventory_sources(source_frames)
+    formatted_date = max(source_dates.values()).strftime("%d/%m/%y")
+
+    # המכירות נכון לרגע המשיכה נשמרות עם הסנאפשוט - "לפני" של הפיד אחרי הרוטציה הבאה
+    # (אם נתוני ההזמנות לא נטענו, נשמר מלאי בלבד והפיד ישווה רק מלאי)
+    df_regular = load_data_from_sql()[0]
+    if not df_regular.empty:
+        sales_90, sales_30 = sales_windows(df_regular, datetime.now().date())
+        pivot_inv = pivot_inv.assign(
+            sales_90=pivot_inv[COL_SKU].map(sales_90).fillna(0).astype(int),
+            sales_30=pivot_inv[COL_SKU].map(sales_30).fillna(0).astype(int)
+        )
+
+    with inventory_write_lock():
+        # שומרים את הסנאפשוט הקודם להשוואה (רק אם המלאי באמת השתנה). קוראים שוב בתוך המנעול -
+        # משיכה מקבילה אולי כבר כתבה את אותו מלאי, ואז אין מה להעביר ל"קודם"
+        current_inv = read_inventory_csv(INVENTORY_CACHE_FILE)
+        if current_inv is not None and inventory_changed(current_inv, pivot_inv):
+            write_file_atomic(INVENTORY_PREV_CACHE_FILE, lambda tmp: shutil.copyfile(INVENTORY_CACHE_FILE, tmp))
+
+        write_file_atomic(INVENTORY_CACHE_FILE, lambda tmp: pivot_inv.to_csv(tmp, index=False))
+        write_file_atomic(INVENTORY_DATE_FILE, lambda tmp: write_text(tmp, formatted_date))
+
+    status_container.success(
+        f"✅ מלאי עודכן בהצלחה (תאריך: {formatted_date}) - "
+        + ", ".join(f"{name}: {dt.strftime('%d/%m/%y')}" for name, dt in source_dates.items())
+    )
+    return pivot_inv, formatted_date
+
+# ==========================================
+# 🧮 חישובי מלאי ופיד שינויים
+# ==========================================
+
+def stock_by_sku(df_inv):
+    return df_inv.groupby(COL_SKU)[COL_STOCK].sum()
+
+def build_inventory_inputs(stock, sales_90, sales_30):
+    # טבלת קלט אחת לכל מק"ט: מלאי + מכירות 90/30 יום
+    inputs = stock.to_frame(COL_STOCK).join(sales_90.rename("sales_90")).join(sales_30.rename("sales_30"))
+    return inputs[INVENTORY_INPUT_COLS].fillna(0).astype(int)
+
+def compute_inventory_metrics(inputs):
+    velocity = inputs["sales_30"] / 30
+    return inputs.assign(
+        velocity_daily=velocity,
+        avg_monthly_sales=(inputs["sales_90"] / 3).astype(int),
+        days_of_inventory=(inputs[COL_STOCK] / velocity.where(velocity > 0)).fillna(9999)
+    )
+
+def sales_windows(df_regular, today):
+    recent = df_regular[df_regular['date_only'] >= today - timedelta(days=90)]
+    sales_90 = recent.groupby(COL_SKU)[COL_QUANTITY].sum()
+    sales_30 = recent[recent['date_only'] >= today - timedelta(days=30)].groupby(COL_SKU)[COL_QUANTITY].sum()
+    return sales_90, sales_30
+
+def diff_inventory_snapshots(prev_inputs, curr_inputs):
+    # קלט לפני/אחרי רק למק"טים שהמלאי או המכירות שלהם זזו.
+    # מק"ט שחסר באחד הסנאפשוטים (למשל אזל ונמחק מהגיליון) = מלאי 0
+    skus = prev_inputs.index.union(curr_inputs.index)
+    prev_inputs = prev_inputs.reindex(skus, fill_value=0)
+    curr_inputs = curr_inputs.reindex(skus, fill_value=0)
+    changed = prev_inputs.ne(curr_inputs).any(axis=1)
+    return prev_inputs[changed], curr_inputs[changed]
+
+@st.cache_resource(max_entries=4)
+def load_inventory_analysis(snapshot_key, today):
+    """
+    מדדי מלאי לכל מק"ט, ומדדי לפני/אחרי למק"טים שהמלאי או המכירות שלהם זזו מול הסנאפשוט הקודם.
+    משותף לכל הסשנים - מחושב מחדש רק כשמשתנים הסנאפשוט, היום או נתוני המכירות (כפתור רענון),
+    כך שריצה שנובעת משינוי ווידג'ט לא מחשבת כלום.
+    """
+    df_regular = load_data_from_sql()[0]
+    df_inv, _, df_prev = load_inventory_snapshot(snapshot_key)
+
+    sales_90, sales_30 = sales_windows(df_regular, today)
+    curr_stock = stock_by_sku(df_inv)
+    metrics = compute_inventory_metrics(build_inventory_inputs(curr_stock, sales_90, sales_30))
+
+    prev_changes, curr_changes = None, None
+    if df_prev is not None:
+        prev_stock = stock_by_sku(df_prev)
+        skus = prev_stock.index.union(curr_stock.index)
+        if set(SNAPSHOT_SALES_COLS) <= set(df_prev.columns):
+            # המכירות כפי שהיו כשהסנאפשוט הקודם נמשך
+            prev_sales = df_prev.groupby(COL_SKU)[SNAPSHOT_SALES_COLS].sum()
+            prev_sales_90, prev_sales_30 = prev_sales['sales_90'], prev_sales['sales_30']
+        else:
+            # סנאפשוט ישן שנשמר בלי מכירות - אפשר להשוות רק מלאי
+            prev_sales_90, prev_sales_30 = sales_90, sales_30
+        prev_inputs, curr_inputs = diff_inventory_snapshots(
+            build_inventory_inputs(prev_stock.reindex(skus, fill_value=0), prev_sales_90, prev_sales_30),
+            build_inventory_inputs(curr_stock.reindex(skus, fill_value=0), sales_90, sales_30)
+        )
+        prev_changes = compute_inventory_metrics(prev_inputs)
+        curr_changes = compute_inventory_metrics(curr_inputs)
+
+    return metrics.reset_index(), prev_changes, curr_changes
+
+def inventory_alert_flags(metrics, threshold_units, threshold_days, threshold_dead):
+    stock = metrics[COL_STOCK]
+    is_low = (stock < threshold_units) | ((metrics["days_of_inventory"] < threshold_days) & (stock > 0))
+    is_dead = (metrics["sales_90"] <= threshold_dead) & (stock > 0)
+    return is_low, is_dead
+
+def build_inventory_change_feed(prev_changes, curr_changes, threshold_units, threshold_days, threshold_dead):
+    """
+    פיד שינויים מול הסנאפשוט הקודם: מה נכנס למלאי נמוך, מה הפך למלאי מת ומה חודש.
+    עובר רק על המק"טים שהמלאי או המכירות שלהם זזו, כך שהחישוב זול גם כשמשנים ספים.
+    """
+    feed_cols = [COL_SKU, "change", "prev_stock", COL_STOCK, "prev_sales_90", "sales_90", "days_of_inventory"]
+    if prev_changes is None or prev_changes.empty:
+        return pd.DataFrame(columns=feed_cols)
+
+    prev_low, prev_dead = inventory_alert_flags(prev_changes, threshold_units, threshold_days, threshold_dead)
+    curr_low, curr_dead = inventory_alert_flags(curr_changes, threshold_units, threshold_days, threshold_dead)
+
+    prev_stock = prev_changes[COL_STOCK]
+    restock_floor = max(threshold_units, 1)
+    restocked = (prev_stock < restock_floor) & (curr_changes[COL_STOCK] >= restock_floor)
+    events = {
+        "🔻 נכנס למלאי נמוך": curr_low & ~prev_low,
+        # מק"ט שחודש ועוד לא נמכר הוא חידוש מלאי, לא מלאי מת
+        "💀 הפך למלאי מת": curr_dead & ~prev_dead & ~restocked,
+        "📦 חודש מלאי": restocked,
+    }
+
+    parts = []
+    for label, mask in events.items():
+        part = curr_changes.loc[mask, [COL_STOCK, "sales_90", "days_of_inventory"]]
+        part.insert(1, "prev_sales_90", prev_changes.loc[mask, "sales_90"])
+        part.insert(0, "prev_stock", prev_stock[mask])
+        part.insert(0, "change", label)
+        parts.append(part)
+
+    feed = pd.concat(parts).reset_index()
+    return feed[feed_cols]
+
+# ==========================================
+# 📏 ניטור זיכרון לפי סשן
+# ==========================================
+
+def frame_nbytes(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(index=True, deep=True)
+        return int(usage.sum()) if isinstance(obj, pd.DataFrame) else int(usage)
+    if isinstance(obj, (tuple, list)):
+        return sum(frame_nbytes(item) for item in obj)
+    return 0
+
+# טבלאות שכל ריצה בונה לעצמה (סינון, תצוגות) - מהן נספרת העלות של סשן מעבר לנתונים המשותפים
+RERUN_FRAME_NAMES = [
+    "df_curr_month", "df_filtered", "display_df", "daily_data",
+    "df_stats_90", "df_stats_30", "sku_stats_90", "sku_stats_30", "sku_stats", "top_df", "slow_movers",
+    "df_last_units", "df_low_days", "display_low_days", "df_dead", "df_pre_filtered", "pre_view",
+    "df_feed", "display_feed", "df_parts_view", "df_pickups_view",
+]
+
+@st.cache_resource
+def session_memory_registry():
+    # מזהה סשן -> {bytes: הטבלאות שנבנו בריצה האחרונה של הסשן, seen}, משותף לכל הסשנים
+    return {}, threading.Lock()
+
+def touch_session():
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex[:8]
+
+    registry, lock = session_memory_registry()
+    now_ts = time.time()
+    with lock:
+        entry = registry.setdefault(st.session_state["session_id"], {"bytes": None})
+        entry["seen"] = now_ts
+        for sid in [sid for sid, e in registry.items() if now_ts - e["seen"] > SESSION_IDLE_SECONDS]:
+            del registry[sid]
+
+def record_rerun_memory(script_vars, shared_frames):
+    """
+    רושם את גודל הטבלאות שהריצה הנוכחית בנתה (RERUN_FRAME_NAMES), בלי אובייקטים משותפים מהמטמון
+    (למשל df_filtered כשאין סינון). נמדד לכל סשן בנפרד, כך שסשנים במקביל לא משפיעים זה על זה.
+    """
+    shared_ids = {id(frame) for frame in shared_frames}
+    rerun_bytes = sum(
+        frame_nbytes(script_vars.get(name))
+        for name in RERUN_FRAME_NAMES
+        if id(script_vars.get(name)) not in shared_ids
+    )
+
+    registry, lock = session_memory_registry()
+    with lock:
+        entry = registry.get(st.session_state["session_id"])
+        if entry is not None:
+            entry["bytes"] = rerun_bytes
+        return {sid: dict(e) for sid, e in registry.items()}
+
 # ==========================================
 # 🖥️ ממשק ראשי
 # ==========================================
 
+touch_session()
+
 # פריקת הנתונים - עכשיו מקבלים 5 דאטה-פריימים
 df, df_pre_orders, df_sales_all, df_parts, df_pickups = load_data_from_sql()
 
@@ -351,24 +727,17 @@ st.sidebar.title("תפריט")
 
 if st.sidebar.button("🔄 רענן נתונים עכשיו"):
     load_data_from_sql.clear()
+    load_inventory_analysis.clear()
     st.rerun()
 
 st.sidebar.divider()
 
-if "inventory_df" not in st.session_state:
-    cached_inv, cached_date = load_inventory_cache()
-    if cached_inv is not None:
-        st.session_state["inventory_df"] = cached_inv
-        st.session_state["inventory_date"] = cached_date
-    else:
-        st.session_state["inventory_df"] = None
-        st.session_state["inventory_date"] = None
-
 if st.sidebar.button("📧 משוך מלאי עדכני"):
-    inv_data, inv_date_str = fetch_inventory_from_email()
-    if inv_data is not None:
-        st.session_state["inventory_df"] = inv_data
-        st.session_state["inventory_date"] = inv_date_str
+    fetch_inventory_from_sources()
+
+# מלאי משותף לכל הסשנים - נטען מחדש רק כשאחד מקבצי המלאי משתנה
+inventory_snapshot = inventory_snapshot_key()
+inventory_df, inventory_date, _ = load_inventory_snapshot(inventory_snapshot)
 
 st.title("📦 דשבורד ניהול הזמנות")
 
@@ -377,7 +746,7 @@ st.title("📦 דשבורד ניהול הזמנות")
 df_for_calc = df_sales_all  # <--- השינוי הוא כאן!
 
 try:
-    now = datetime.now(ZoneInfo("Asia/Jerusalem"))
+    now = datetime.now(LOCAL_TZ)
 except Exception:
     now = datetime.now()
 
@@ -417,20 +786,20 @@ tab_dashboard, tab_inventory = st.tabs(["📊 דשבורד והזמנות", "
 # ========================================================
 with tab_dashboard:
     # משתמשים ב-df_sales_all (מכירות בלבד, כולל PRE, בלי חלקי חילוף)
-    df_filtered = df_sales_all.copy()
+    df_filtered = df_sales_all
 
     with st.container():
         st.markdown("### 📅 סינון לפי תאריכים")
         
-        today_default = datetime.now(ZoneInfo("Asia/Jerusalem")).date()
+        today_default = datetime.now(LOCAL_TZ).date()
         first_of_month = today_default.replace(day=1)
         
         col_filter1, col_filter2, col_spacer = st.columns([1, 1, 2])
         
         with col_filter1:
-            start_date = st.date_input("מתאריך:", value=first_of_month, format="DD/MM/YYYY")
+            start_date = st.date_input("מתאריך:", value=first_of_month, format="DD/MM/YYYY", key="date_from")
         with col_filter2:
-            end_date = st.date_input("עד תאריך:", value=today_default, format="DD/MM/YYYY")
+            end_date = st.date_input("עד תאריך:", value=today_default, format="DD/MM/YYYY", key="date_to")
 
         if start_date and end_date:
             if start_date <= end_date:
@@ -449,10 +818,10 @@ with tab_dashboard:
         "טלפון": COL_PHONE
     }
     
-    search_type_label = st.sidebar.selectbox("חפש לפי:", list(search_options.keys()))
+    search_type_label = st.sidebar.selectbox("חפש לפי:", list(search_options.keys()), key="search_type")
     selected_col = search_options[search_type_label]
     
-    search_term = st.sidebar.text_input("ערך לחיפוש:")
+    search_term = st.sidebar.text_input("ערך לחיפוש:", key="search_term")
 
     if search_term:
         if selected_col == COL_SKU:
@@ -494,8 +863,8 @@ with tab_dashboard:
     cutoff_30 = datetime.now().date() - timedelta(days=30)
     
     # שימוש ב-df (רק מכירות רגילות עם תאריך תקין) עבור סטטיסטיקות
-    df_stats_90 = df[df['date_only'] >= cutoff_90].copy()
-    df_stats_30 = df[df['date_only'] >= cutoff_30].copy()
+    df_stats_90 = df[df['date_only'] >= cutoff_90]
+    df_stats_30 = df[df['date_only'] >= cutoff_30]
     
     if not df_stats_90.empty and COL_SKU in df_stats_90.columns and COL_QUANTITY in df_stats_90.columns:
         
@@ -512,8 +881,8 @@ with tab_dashboard:
             
             with col_top:
                 st.subheader("🏆 המוצרים המובילים (3 חודשים)")
-                top_n = st.number_input("כמות להצגה (ברירת מחדל 10):", min_value=1, value=10, step=1)
-                top_df = sku_stats.sort_values(by='sales_90', ascending=False).head(top_n).copy()
+                top_n = st.number_input("כמות להצגה (ברירת מחדל 10):", min_value=1, value=10, step=1, key="top_n")
+                top_df = sku_stats.sort_values(by='sales_90', ascending=False).head(top_n)
                 
                 top_df['avg_monthly_sales'] = (top_df['sales_90'] / 3).astype(int)
                 
@@ -530,8 +899,8 @@ with tab_dashboard:
 
             with col_bottom:
                 st.subheader("🐢 מוצרים איטיים / חלשים")
-                threshold = st.number_input("הצג מוצרים עם כמות חבילות עד (כולל):", min_value=1, value=3, step=1)
-                slow_movers = sku_stats[sku_stats['sales_90'] <= threshold].sort_values(by='sales_90', ascending=True).copy()
+                threshold = st.number_input("הצג מוצרים עם כמות חבילות עד (כולל):", min_value=1, value=3, step=1, key="th_slow")
+                slow_movers = sku_stats[sku_stats['sales_90'] <= threshold].sort_values(by='sales_90', ascending=True)
                 
                 slow_movers['avg_monthly_sales'] = (slow_movers['sales_90'] / 3).astype(int)
                 
@@ -562,7 +931,7 @@ with tab_dashboard:
     
     display_cols = [COL_DATE, COL_ORDER_NUM, COL_CUSTOMER, COL_PHONE, COL_CITY, COL_STREET, COL_HOUSE, COL_SKU, COL_QUANTITY, COL_SHIP_NUM]
     final_cols = [c for c in display_cols if c in df_filtered.columns]
-    display_df = df_filtered[final_cols].copy()
+    display_df = df_filtered[final_cols]
     if COL_DATE in display_df.columns: display_df[COL_DATE] = display_df[COL_DATE].dt.strftime('%d/%m/%Y')
 
     st.dataframe(display_df, use_container_width=True, hide_index=True, height=500)
@@ -571,50 +940,45 @@ with tab_dashboard:
 # TAB 2: ניתוח מלאי חכם
 # ========================================================
 with tab_inventory:
-    if st.session_state["inventory_df"] is None:
+    if inventory_df is None:
         st.info("💡 אין נתוני מלאי שמורים. לחץ על '📧 משוך מלאי עדכני' בסרגל הצד.")
     else:
-        df_inv = st.session_state["inventory_df"].copy()
-        
-        inv_date_display = st.session_state.get("inventory_date", "לא ידוע")
-        
-        cutoff_90 = datetime.now().date() - timedelta(days=90)
-        cutoff_30 = datetime.now().date() - timedelta(days=30)
-        
-        sales_90 = df[df['date_only'] >= cutoff_90].groupby(COL_SKU)[COL_QUANTITY].sum().reset_index().rename(columns={COL_QUANTITY: "sales_90"})
-        sales_30 = df[df['date_only'] >= cutoff_30].groupby(COL_SKU)[COL_QUANTITY].sum().reset_index().rename(columns={COL_QUANTITY: "sales_30"})
-        
-        merged = pd.merge(df_inv, sales_90, on=COL_SKU, how="left")
-        merged = pd.merge(merged, sales_30, on=COL_SKU, how="left")
+        df_inv = inventory_df
         
-        merged["sales_90"] = merged["sales_90"].fillna(0).astype(int)
-        merged["sales_30"] = merged["sales_30"].fillna(0).astype(int)
-        merged["מלאי_נוכחי"] = merged["מלאי_נוכחי"].fillna(0).astype(int)
+        inv_date_display = inventory_date or "לא ידוע"
         
-        merged["velocity_daily"] = merged["sales_30"] / 30
-        merged["avg_monthly_sales"] = (merged["sales_90"] / 3).astype(int)
-        
-        merged["days_of_inventory"] = merged.apply(
-            lambda x: x["מלאי_נוכחי"] / x["velocity_daily"] if x["velocity_daily"] > 0 else 9999, 
-            axis=1
-        )
+        # מחושב פעם אחת לכל סנאפשוט/יום ומשותף לכל הסשנים
+        merged, prev_changes, curr_changes = load_inventory_analysis(inventory_snapshot, datetime.now().date())
 
         st.subheader(f"🏭 ניתוח מלאי מפוצל (מציג מלאי מתאריך: {inv_date_display})")
         
+        source_cols = source_stock_columns(df_inv)
+        if len(source_cols) > 1:
+            with st.expander(f"📍 פירוט מלאי לפי מקור ({len(source_cols)} מקורות)"):
+                st.dataframe(
+                    df_inv[[COL_SKU, COL_STOCK] + source_cols].sort_values(COL_STOCK, ascending=False),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        COL_STOCK: st.column_config.NumberColumn("סה\"כ", format="%d"),
+                        **{c: st.column_config.NumberColumn(c[len(SOURCE_STOCK_PREFIX):], format="%d") for c in source_cols}
+                    }
+                )
+        
         row1_col1, row1_col2 = st.columns(2)
         
         with row1_col1:
             st.markdown("#### 📦 יחידות אחרונות")
             threshold_units = st.number_input("הצג מוצרים עם מלאי פיזי מתחת ל:", min_value=0, value=10, step=1, key="th_units")
             
-            df_last_units = merged[merged["מלאי_נוכחי"] < threshold_units].sort_values("מלאי_נוכחי", ascending=True)
+            df_last_units = merged[merged[COL_STOCK] < threshold_units].sort_values(COL_STOCK, ascending=True)
             
             st.dataframe(
-                df_last_units[[COL_SKU, "מלאי_נוכחי", "avg_monthly_sales", "sales_30"]],
+                df_last_units[[COL_SKU, COL_STOCK, "avg_monthly_sales", "sales_30"]],
                 use_container_width=True,
                 hide_index=True,
                 column_config={
-                    "מלאי_נוכחי": st.column_config.NumberColumn("יחידות במלאי", format="%d"),
+                    COL_STOCK: st.column_config.NumberColumn("יחידות במלאי", format="%d"),
                     "avg_monthly_sales": st.column_config.NumberColumn("ממוצע ביקוש (3 חודשים)", format="%d"),
                     "sales_30": st.column_config.NumberColumn("ביקוש (30 יום)", format="%d")
                 }
@@ -627,18 +991,17 @@ with tab_inventory:
             
             df_low_days = merged[
                 (merged["days_of_inventory"] < threshold_days) & 
-                (merged["מלאי_נוכחי"] > 0)
+                (merged[COL_STOCK] > 0)
             ].sort_values("days_of_inventory", ascending=True)
             
-            display_low_days = df_low_days.copy()
-            display_low_days["days_of_inventory"] = display_low_days["days_of_inventory"].astype(int)
+            display_low_days = df_low_days.assign(days_of_inventory=df_low_days["days_of_inventory"].astype(int))
             
             st.dataframe(
-                display_low_days[[COL_SKU, "מלאי_נוכחי", "avg_monthly_sales", "sales_30", "days_of_inventory"]],
+                display_low_days[[COL_SKU, COL_STOCK, "avg_monthly_sales", "sales_30", "days_of_inventory"]],
                 use_container_width=True,
                 hide_index=True,
                 column_config={
-                    "מלאי_נוכחי": st.column_config.NumberColumn("במלאי", format="%d"),
+                    COL_STOCK: st.column_config.NumberColumn("במלאי", format="%d"),
                     "avg_monthly_sales": st.column_config.NumberColumn("ממוצע ביקוש (3 חודשים)", format="%d"),
                     "sales_30": st.column_config.NumberColumn("ביקוש (30 יום)", format="%d"),
                     "days_of_inventory": st.column_config.NumberColumn("ימים לסיום המלאי", format="%d")
@@ -656,15 +1019,15 @@ with tab_inventory:
             
             df_dead = merged[
                 (merged["sales_90"] <= threshold_dead) & 
-                (merged["מלאי_נוכחי"] > 0)
-            ].sort_values("מלאי_נוכחי", ascending=False)
+                (merged[COL_STOCK] > 0)
+            ].sort_values(COL_STOCK, ascending=False)
             
             st.dataframe(
-                df_dead[[COL_SKU, "מלאי_נוכחי", "sales_90", "sales_30"]],
+                df_dead[[COL_SKU, COL_STOCK, "sales_90", "sales_30"]],
                 use_container_width=True,
                 hide_index=True,
                 column_config={
-                    "מלאי_נוכחי": st.column_config.NumberColumn("תקוע במלאי", format="%d"),
+                    COL_STOCK: st.column_config.NumberColumn("תקוע במלאי", format="%d"),
                     "sales_90": st.column_config.NumberColumn("מכירות (90 יום)", format="%d"),
                     "sales_30": st.column_config.NumberColumn("מכירות (30 יום)", format="%d")
                 }
@@ -676,7 +1039,7 @@ with tab_inventory:
             threshold_pre = st.number_input("הצג מוצרים עם כמות מוזמנת מעל:", min_value=0, value=0, step=1, key="th_pre")
             
             if not df_pre_orders.empty:
-                df_pre_filtered = df_pre_orders[df_pre_orders['backlog_qty'] > threshold_pre].copy()
+                df_pre_filtered = df_pre_orders[df_pre_orders['backlog_qty'] > threshold_pre]
                 
                 pre_view = df_pre_filtered.rename(columns={
                     'sku': 'מק"ט',
@@ -695,6 +1058,41 @@ with tab_inventory:
             else:
                 st.info("אין נתונים להצגה")
         
+        # --- פיד שינויים מול הסנאפשוט הקודם ---
+        st.divider()
+        st.subheader("🔔 מה זז מאז העדכון הקודם")
+        
+        df_feed = build_inventory_change_feed(
+            prev_changes, curr_changes,
+            threshold_units, threshold_days, threshold_dead
+        )
+        
+        if df_feed.empty:
+            st.info("אין שינויים בהתראות המלאי מאז העדכון הקודם")
+        else:
+            feed_counts = df_feed["change"].value_counts()
+            feed_kpi1, feed_kpi2, feed_kpi3 = st.columns(3)
+            feed_kpi1.metric("🔻 נכנסו למלאי נמוך", int(feed_counts.get("🔻 נכנס למלאי נמוך", 0)))
+            feed_kpi2.metric("💀 הפכו למלאי מת", int(feed_counts.get("💀 הפך למלאי מת", 0)))
+            feed_kpi3.metric("📦 חודשו", int(feed_counts.get("📦 חודש מלאי", 0)))
+            
+            display_feed = df_feed.assign(days_of_inventory=df_feed["days_of_inventory"].astype(int))
+            
+            st.dataframe(
+                display_feed,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "change": st.column_config.TextColumn("שינוי"),
+                    "prev_stock": st.column_config.NumberColumn("מלאי קודם", format="%d"),
+                    COL_STOCK: st.column_config.NumberColumn("מלאי נוכחי", format="%d"),
+                    "prev_sales_90": st.column_config.NumberColumn("מכירות קודמות (90 יום)", format="%d"),
+                    "sales_90": st.column_config.NumberColumn("מכירות (90 יום)", format="%d"),
+                    "days_of_inventory": st.column_config.NumberColumn("ימים לסיום המלאי", format="%d")
+                }
+            )
+            st.caption(f"{len(df_feed)} שינויים")
+        
         # --- חלק חדש: טבלאות חלקי חילוף ואיסופים ---
         st.divider()
         st.subheader("🔧 דוח חלקי חילוף ואיסופים (כללי)")
@@ -738,3 +1136,51 @@ with tab_inventory:
                 )
             else:
                 st.info("אין נתונים על איסופים")
+
+# ========================================================
+# 📏 צריכת זיכרון (משותף + לכל סשן)
+# ========================================================
+shared_frames = [*load_data_from_sql(), *load_inventory_snapshot(inventory_snapshot)]
+sessions_memory = record_rerun_memory(globals(), shared_frames)
+
+with st.sidebar.expander("📏 צריכת זיכרון"):
+    if st.toggle("חשב צריכת זיכרון", key="show_memory"):
+        mb = 1024 * 1024
+        # הטבלאות המשותפות נספרות פעם אחת בלבד, לא משנה כמה סשנים פתוחים
+        shared_bytes = frame_nbytes(shared_frames)
+        
+        measured = [e["bytes"] for e in sessions_memory.values() if e["bytes"] is not None]
+        current_bytes = sessions_memory[st.session_state["session_id"]]["bytes"]
+        max_rerun_bytes = max(measured, default=0)
+        # סשן שעוד לא סיים ריצה נספר לפי הריצה הכבדה ביותר
+        sessions_bytes = sum(measured) + (len(sessions_memory) - len(measured)) * max_rerun_bytes
+        
+        st.metric("👥 סשנים פעילים", len(sessions_memory))
+        st.metric("🗂️ נתונים משותפים", f"{shared_bytes / mb:,.1f} MB")
+        st.metric("👤 ריצה אחרונה בסשן", f"{current_bytes / mb:,.1f} MB")
+        st.metric("🔝 הריצה הכבדה ביותר", f"{max_rerun_bytes / mb:,.1f} MB")
+        st.metric("🧮 סה\"כ משוער (כולם רצים יחד)", f"{(shared_bytes + sessions_bytes) / mb:,.1f} MB")
+        
+        now_ts = time.time()
+        df_sessions = pd.DataFrame(
+            [
+                (sid, None if e["bytes"] is None else e["bytes"] / mb, int((now_ts - e["seen"]) / 60))
+                for sid, e in sessions_memory.items()
+            ],
+            columns=["session", "mb", "idle_min"]
+        ).sort_values("mb", ascending=False)
+        st.dataframe(
+            df_sessions,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "session": st.column_config.TextColumn("סשן"),
+                "mb": st.column_config.NumberColumn("MB לריצה", format="%.1f"),
+                "idle_min": st.column_config.NumberColumn("דקות מאז ריצה", format="%d")
+            }
+        )
+        st.caption(
+            f"MB לריצה = גודל הטבלאות שהריצה האחרונה של הסשן בנתה לעצמה (סינון ותצוגות), "
+            f"בלי הנתונים המשותפים. טבלאות שחולקות עמודות עם המקור נספרות במלואן, כך שזו הערכה עליונה. "
+            f"סשנים שלא רצו {SESSION_IDLE_SECONDS // 60} דקות לא נספרים."
+        )
@@ -0,0 +1,352 @@
+"""
+בדיקת עומס לדשבורד: מריץ סשנים מדומים במקביל דרך Streamlit AppTest (בלי דפדפן),
+על נתונים סינתטיים ועם SQLite מקומי במקום מסד הנתונים ב-Supabase.
+
+כל סשן משנה טווח תאריכים, חיפוש וספי מלאי, ולכל כמות סשנים מודפסים
+p50/p95/p99 של זמן ריצה מחדש (rerun), תפוקה וזיכרון.
+
+    python load_test.py --sessions 1 5 10 20 --reruns 20 --orders 50000 --skus 2000
+
+AppTest מחליף משתנים גלובליים של התהליך בזמן ריצה (st.secrets, ה-Runtime), ולכן כל סשן
+רץ בתהליך נפרד, וכל הסשנים של אותה רמה מתחילים יחד (Barrier) - הריצות באמת חופפות בזמן
+ומתחרות על אותן ליבות. שימו לב להבדל משרת `streamlit run` יחיד: שם כל הסשנים חולקים
+GIL אחד ומטמון אחד, וכאן לכל סשן GIL ומטמון משלו. כשיש יותר סשנים מליבות התוצאות
+קרובות לשרת יחיד; כשיש מספיק ליבות הן חסם תחתון להשהיה שלו.
+
+הזמנים נמדדים תמיד בלי tracemalloc. הזיכרון נמדד במעבר נפרד שלא נמדד בזמן, אחרי שכל הסשנים
+של הרמה סיימו את המעבר המתוזמן, ובו אותן אינטראקציות חוזרות עם tracemalloc:
+  - בסיס: RSS של תהליך אחרי החימום - פייתון, הספריות והנתונים המשותפים במטמון. בשרת יחיד
+    הוא קיים פעם אחת, כאן כל תהליך מחזיק עותק משלו, ולכן לא מסכמים RSS של התהליכים.
+  - לסשן: שיא ה-working set של הריצה הכבדה ביותר של הסשן, מעבר למה שכבר היה טעון.
+  - סה"כ משוער לשרת יחיד עם N סשנים = בסיס + סכום ה-working set של כל הסשנים (כולם רצים יחד).
+--no-memory מדלג על מעבר הזיכרון.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+
+# אותם שמות קבצים כמו ב-dashboard.py (הדשבורד קורא אותם מתיקיית העבודה)
+INVENTORY_CACHE_FILE = "inventory_cache.csv"
+INVENTORY_DATE_FILE = "inventory_date.txt"
+INVENTORY_PREV_CACHE_FILE = "inventory_prev_cache.csv"
+
+ORDER_TYPES = ["Regular Order", "Pre-Order", "Spare Part", "Pickup"]
+ORDER_TYPE_WEIGHTS = [0.85, 0.05, 0.06, 0.04]
+CITIES = ["תל אביב", "חיפה", "ירושלים", "באר שבע", "נתניה", "אשדוד"]
+NAMES = ["דנה", "יוסי", "מיכל", "אבי", "נועה", "רון", "שירה", "עומר"]
+
+# ==========================================
+# 🧪 נתונים סינתטיים
+# ==========================================
+
+def synthetic_skus(n_skus):
+    return [f"SKU-{i:05d}" for i in range(n_skus)]
+
+def build_synthetic_db(db_path, n_orders, n_skus, seed):
+    rng = np.random.default_rng(seed)
+    skus = synthetic_skus(n_skus)
+    now = datetime.now()
+
+    # מכירות לפי התפלגות זנב ארוך - מעט מק"טים מוכרים הרבה
+    sku_weights = 1 / np.arange(1, n_skus + 1)
+    sku_weights /= sku_weights.sum()
+
+    order_dates = now - pd.to_timedelta(rng.integers(0, 180 * 24 * 60, n_orders), unit="m")
+    has_ship = rng.random(n_orders) < 0.8
+
+    orders = pd.DataFrame({
+        "order_num": rng.integers(100000, 999999, n_orders).astype(str),
+        "customer_name": rng.choice(NAMES, n_orders),
+        "phone": [f"05{p:08d}" for p in rng.integers(0, 10 ** 8, n_orders)],
+        "city": rng.choice(CITIES, n_orders),
+        "street": "הרצל",
+        "house_num": rng.integers(1, 200, n_orders).astype(str),
+        "sku": rng.choice(skus, n_orders, p=sku_weights),
+        "quantity": rng.integers(1, 4, n_orders),
+        "shipping_num": np.where(has_ship, rng.integers(10 ** 6, 10 ** 7, n_orders).astype(str), ""),
+        "order_date": pd.Series(order_dates).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "message_log": "",
+        "order_type": rng.choice(ORDER_TYPES, n_orders, p=ORDER_TYPE_WEIGHTS),
+    })
+
+    conn = sqlite3.connect(db_path)
+    orders.to_sql("all_orders_view", conn, index=False, if_exists="replace")
+    conn.close()
+    return orders
+
+def build_synthetic_inventory(workdir, n_skus, seed):
+    rng = np.random.default_rng(seed + 1)
+    skus = synthetic_skus(n_skus)
+
+    prev_stock = rng.integers(0, 200, n_skus)
+    # בערך עשירית מהמק"טים זזים בין הסנאפשוטים
+    moved = rng.random(n_skus) < 0.1
+    stock = np.where(moved, rng.integers(0, 200, n_skus), prev_stock)
+
+    pd.DataFrame({"מקט": skus, "מלאי_נוכחי": prev_stock}).to_csv(
+        os.path.join(workdir, INVENTORY_PREV_CACHE_FILE), index=False
+    )
+    pd.DataFrame({"מקט": skus, "מלאי_נוכחי": stock}).to_csv(
+        os.path.join(workdir, INVENTORY_CACHE_FILE), index=False
+    )
+    with open(os.path.join(workdir, INVENTORY_DATE_FILE), "w") as f:
+        f.write(datetime.now().strftime("%d/%m/%y"))
+
+# ==========================================
+# 👥 סשנים מדומים
+# ==========================================
+
+def new_session(timeout):
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    # הפרטים לא משנים - psycopg2.connect מוחלף ב-SQLite
+    at.secrets["supabase"] = {
+        "DB_HOST": "localhost", "DB_PORT": 5432, "DB_NAME": "orders",
+        "DB_USER": "load_test", "DB_PASS": "load_test",
+    }
+    return at
+
+def change_date_range(at, rng, sample_values):
+    today = datetime.now().date()
+    start = today - timedelta(days=rng.randint(0, 150))
+    end = min(start + timedelta(days=rng.randint(0, 60)), today)
+    at.date_input(key="date_from").set_value(start)
+    at.date_input(key="date_to").set_value(end)
+
+def change_search(at, rng, sample_values):
+    search_type = at.selectbox(key="search_type")
+    label = rng.choice(search_type.options)
+    search_type.set_value(label)
+    # לפעמים מנקים את החיפוש, כמו משתמש אמיתי
+    term = "" if rng.random() < 0.25 else rng.choice(sample_values[label])
+    at.text_input(key="search_term").input(term)
+
+def change_inventory_threshold(at, rng, sample_values):
+    key, low, high = rng.choice([("th_units", 0, 50), ("th_days", 0, 365), ("th_dead", 0, 10)])
+    at.number_input(key=key).set_value(rng.randint(low, high))
+
+ACTIONS = [change_date_range, change_search, change_inventory_threshold]
+
+def search_samples(orders, rng):
+    # ערכי חיפוש אמיתיים מתוך הנתונים הסינתטיים, לפי התוויות בתיבת "חפש לפי"
+    pick = lambda col, n=50: [str(v) for v in rng.sample(list(orders[col].unique()), min(n, orders[col].nunique()))]
+    return {
+        'מק"ט': [s[:7] for s in pick("sku")],
+        "מספר הזמנה": pick("order_num"),
+        "שם לקוח": pick("customer_name"),
+        "טלפון": [p[-6:] for p in pick("phone")],
+    }
+
+def run_timed(at):
+    # מחזיר (זמן ריצה, מספר שגיאות)
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start, len(at.exception)
+
+def run_traced(at):
+    # כמה זיכרון הריצה הקצתה מעבר למה שכבר היה טעון (דורש tracemalloc פעיל)
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    at.run()
+    return tracemalloc.get_traced_memory()[1] - baseline
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def quiet_streamlit_logs():
+    # אזהרות של streamlit (deprecation, ריצה מחוץ לשרת) נרשמות בכל ריצה ומציפות את הפלט
+    for noisy_logger in [
+        "streamlit.deprecation_util",
+        "streamlit.runtime.scriptrunner_utils.script_run_context",
+        "streamlit.runtime.caching.cache_data_api",
+    ]:
+        logging.getLogger(noisy_logger).disabled = True
+
+def session_worker(session_idx, config, barrier, results):
+    """סשן אחד בתהליך משלו. מחזיר את התוצאות דרך התור (או את השגיאה אם נפל)."""
+    quiet_streamlit_logs()
+    os.chdir(config["workdir"])
+    standin = lambda **kwargs: sqlite3.connect(config["db_path"])
+    barrier_timeout = config["timeout"] * (config["reruns"] + 5)
+    try:
+        with mock.patch("psycopg2.connect", side_effect=standin):
+            # חימום שלא נמדד: imports וטעינת הנתונים למטמון של התהליך
+            if config["memory"]:
+                tracemalloc.start()
+            new_session(config["timeout"]).run()
+            gc.collect()
+            shared = tracemalloc.get_traced_memory()[0] if config["memory"] else None
+            tracemalloc.stop()
+            base_rss = current_rss()
+
+            # מעבר מתוזמן - כל הסשנים יחד, בלי tracemalloc
+            rng = random.Random(config["seed"] * 1000 + session_idx)
+            at = new_session(config["timeout"])
+            barrier.wait(timeout=barrier_timeout)
+            started = time.time()
+            first_load, errors = run_timed(at)
+            latencies = []
+            for _ in range(config["reruns"]):
+                rng.choice(ACTIONS)(at, rng, config["sample_values"])
+                elapsed, run_errors = run_timed(at)
+                latencies.append(elapsed)
+                errors += run_errors
+            finished = time.time()
+            del at
+
+            # מעבר זיכרון - מתחיל רק אחרי שכל הסשנים סיימו את המעבר המתוזמן
+            peak = None
+            barrier.wait(timeout=barrier_timeout)
+            if config["memory"]:
+                rng = random.Random(config["seed"] * 1000 + session_idx)
+                at = new_session(config["timeout"])
+                tracemalloc.start()
+                peak = run_traced(at)
+                for _ in range(config["reruns"]):
+                    rng.choice(ACTIONS)(at, rng, config["sample_values"])
+                    peak = max(peak, run_traced(at))
+                tracemalloc.stop()
+        results.put({
+            "session": session_idx, "first_load": first_load, "latencies": latencies,
+            "errors": errors, "started": started, "finished": finished,
+            "peak": peak, "shared": shared, "base_rss": base_rss,
+        })
+    except (Exception, threading.BrokenBarrierError) as e:
+        barrier.abort()
+        results.put({"session": session_idx, "failure": repr(e)})
+
+def run_level(n_sessions, config):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(n_sessions)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=session_worker, args=(i, config, barrier, results), daemon=True)
+        for i in range(n_sessions)
+    ]
+    for p in procs:
+        p.start()
+
+    # קוראים מהתור לפני join - אחרת תהליך עם תוצאה גדולה נתקע על כתיבה לתור
+    collected = []
+    deadline = time.monotonic() + config["timeout"] * (config["reruns"] + 10)
+    while len(collected) < n_sessions:
+        try:
+            collected.append(results.get(timeout=1))
+        except queue.Empty:
+            if time.monotonic() > deadline or not any(p.is_alive() for p in procs):
+                break
+    for p in procs:
+        p.join(timeout=5)
+        if p.is_alive():
+            p.terminate()
+
+    failures = [r for r in collected if "failure" in r]
+    failures += [{"session": None, "failure": "התהליך הסתיים בלי תוצאה"}] * (n_sessions - len(collected))
+    return [r for r in collected if "failure" not in r], failures
+
+def summarize(n_sessions, results, failures):
+    latencies = np.array([lat for r in results for lat in r["latencies"]]) * 1000
+    first_loads = np.array([r["first_load"] for r in results]) * 1000
+    wall = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    peaks = [r["peak"] for r in results if r["peak"] is not None]
+    shared = [r["shared"] for r in results if r["shared"] is not None]
+    base_rss = [r["base_rss"] for r in results if r["base_rss"] is not None]
+    mb = 1024 * 1024
+    median_mb = lambda values: np.percentile(values, 50) / mb if values else np.nan
+    return {
+        "sessions": n_sessions,
+        "reruns": len(latencies),
+        "first_load_p50_ms": np.percentile(first_loads, 50),
+        "p50_ms": np.percentile(latencies, 50),
+        "p95_ms": np.percentile(latencies, 95),
+        "p99_ms": np.percentile(latencies, 99),
+        "reruns_per_s": (len(latencies) + len(first_loads)) / wall,
+        "base_rss_mb": median_mb(base_rss),
+        # מה שנשאר מוקצה אחרי החימום: המטמון המשותף ומה שהסקריפט טען בפעם הראשונה
+        "shared_data_mb": median_mb(shared),
+        "session_peak_mb_p50": median_mb(peaks),
+        "session_peak_mb_max": max(peaks) / mb if peaks else np.nan,
+        # כל סשן שנמדד נספר פעם אחת; סשנים שנפלו לא נכללים
+        "server_total_mb": median_mb(base_rss) + sum(peaks) / mb if peaks else np.nan,
+        "errors": sum(r["errors"] for r in results),
+        "failed_sessions": len(failures),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="בדיקת עומס לדשבורד ההזמנות והמלאי")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="כמויות סשנים במקביל לבדיקה")
+    parser.add_argument("--reruns", type=int, default=20, help="אינטראקציות לכל סשן")
+    parser.add_argument("--orders", type=int, default=50000, help="שורות הזמנה סינתטיות")
+    parser.add_argument("--skus", type=int, default=2000, help="מק\"טים סינתטיים")
+    parser.add_argument("--timeout", type=float, default=60, help="זמן מקסימלי לריצה בודדת (שניות)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--csv", help="שמירת התוצאות גם לקובץ CSV")
+    parser.add_argument("--no-memory", action="store_true", help="בלי מעבר מדידת הזיכרון (ריצה מהירה יותר)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="orders_dashboard_load_")
+    try:
+        db_path = os.path.join(workdir, "orders.sqlite")
+        orders = build_synthetic_db(db_path, args.orders, args.skus, args.seed)
+        build_synthetic_inventory(workdir, args.skus, args.seed)
+        print(f"נתונים סינתטיים: {args.orders:,} הזמנות, {args.skus:,} מק\"טים, "
+              f"{os.cpu_count()} ליבות")
+
+        config = {
+            "workdir": workdir, "db_path": db_path, "reruns": args.reruns,
+            "seed": args.seed, "timeout": args.timeout, "memory": not args.no_memory,
+            "sample_values": search_samples(orders, random.Random(args.seed)),
+        }
+        del orders
+
+        rows = []
+        for n_sessions in args.sessions:
+            # תהליכים חדשים בכל רמה - מטמון ריק, כמו שרת שעלה עכשיו
+            results, failures = run_level(n_sessions, config)
+            for failure in failures[:3]:
+                print(f"  סשן {failure['session']} נכשל: {failure['failure']}")
+            if not results:
+                print(f"{n_sessions:>3} סשנים | כל הסשנים נכשלו")
+                continue
+            row = summarize(n_sessions, results, failures)
+            rows.append(row)
+            print(
+                f"{row['sessions']:>3} סשנים | טעינה ראשונה {row['first_load_p50_ms']:7.1f}ms | "
+                f"p50 {row['p50_ms']:7.1f}ms | p95 {row['p95_ms']:7.1f}ms | p99 {row['p99_ms']:7.1f}ms | "
+                f"{row['reruns_per_s']:6.1f} reruns/s | "
+                + ("" if args.no_memory else
+                   f"בסיס {row['base_rss_mb']:6.1f}MB (מהם מהחימום {row['shared_data_mb']:5.1f}MB) + "
+                   f"לסשן {row['session_peak_mb_p50']:5.1f}MB (מקס' {row['session_peak_mb_max']:5.1f}MB) = "
+                   f"סה\"כ לשרת {row['server_total_mb']:7.1f}MB | ")
+                + f"שגיאות {row['errors']} | סשנים שנפלו {row['failed_sessions']}"
+            )
+
+        if args.csv:
+            pd.DataFrame(rows).to_csv(args.csv, index=False)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+פענוח קבצי מלאי. openpyxl מחזיק את ה-GIL לכל אורך הקריאה, כך שפענוח ב-thread רץ בזה
+אחר זה עם שאר הפענוחים ועוצר גם את שאר הסשנים של השרת - ולכן הדשבורד מפענח כל קובץ
+בתהליך פייתון נפרד (parse_stock_file_in_subprocess).
+
+לא ProcessPoolExecutor: תחת streamlit המודול __main__ הוא הסקריפט של הדשבורד עצמו,
+ותהליך spawn/forkserver מריץ אותו מחדש לפני שהוא מגיע לפונקציה.
+"""
+import csv
+import io
+import os
+import pickle
+import re
+import subprocess
+import sys
+
+import pandas as pd
+
+PARSE_TIMEOUT_SECONDS = 120
+
+def clean_sku(val):
+    if pd.isna(val): return ""
+    val = str(val).upper()
+    val = val.replace('/', ' ').replace('\\', ' ')
+    val = re.sub(r'\s+', ' ', val).strip()
+    return val
+
+def find_csv_header_line(text, sku_col):
+    # מספר השורה בקובץ שבה מתחילה שורת הכותרת. בלי pandas: שורות כותרת/כותרת-משנה
+    # עם פחות שדות משורות הנתונים מפילות את read_csv עוד לפני שאפשר לחפש בהן
+    reader = csv.reader(io.StringIO(text))
+    line_start = 0
+    for row in reader:
+        if sku_col in (field.strip() for field in row):
+            return line_start
+        line_start = reader.line_num
+    return -1
+
+def parse_stock_file(file_data, filename, sku_col, qty_col):
+    """מחזיר Series של כמות במלאי לפי מק"ט מנוקה."""
+    # שורת הכותרת לא תמיד בשורה הראשונה - מחפשים את השורה עם עמודת המק"ט
+    if filename.lower().endswith(".csv"):
+        text = file_data.decode("utf-8-sig")
+        header_line = find_csv_header_line(text, sku_col)
+        if header_line == -1:
+            raise ValueError(f"לא נמצאה עמודת '{sku_col}' בקובץ {filename}")
+        lines = io.StringIO(text).readlines()
+        df_inv = pd.read_csv(io.StringIO("".join(lines[header_line:])))
+    else:
+        stock_file = io.BytesIO(file_data)
+        df_temp = pd.read_excel(stock_file, header=None)
+        header_row = -1
+        for i, row in df_temp.iterrows():
+            if sku_col in row.astype(str).values:
+                header_row = i
+                break
+
+        if header_row == -1:
+            raise ValueError(f"לא נמצאה עמודת '{sku_col}' בקובץ {filename}")
+
+        stock_file.seek(0)
+        df_inv = pd.read_excel(stock_file, header=header_row)
+
+    df_inv = df_inv.dropna(subset=[sku_col])
+    qty = pd.to_numeric(df_inv[qty_col], errors="coerce").fillna(0).astype(int)
+    return qty.groupby(df_inv[sku_col].apply(clean_sku)).sum()
+
+def parse_stock_file_in_subprocess(file_data, filename, sku_col, qty_col):
+    """כמו parse_stock_file, בתהליך נפרד. הקובץ עובר ב-stdin והתוצאה חוזרת ב-stdout."""
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), filename, sku_col, qty_col],
+            input=file_data, capture_output=True, timeout=PARSE_TIMEOUT_SECONDS
+        )
+    except subprocess.TimeoutExpired:
+        raise ValueError(f"פענוח {filename} לא הסתיים תוך {PARSE_TIMEOUT_SECONDS} שניות")
+
+    if result.returncode != 0:
+        lines = result.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise ValueError(lines[-1] if lines else f"פענוח {filename} נכשל (קוד {result.returncode})")
+    return pickle.loads(result.stdout)
+
+if __name__ == "__main__":
+    filename, sku_col, qty_col = sys.argv[1:4]
+    try:
+        stock = parse_stock_file(sys.stdin.buffer.read(), filename, sku_col, qty_col)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.buffer.write(pickle.dumps(stock))